@@ -5,6 +5,8 @@ Handles Amazon Midway authentication for Mercury dashboard access
 
 import os
 import csv
+import pickle
+import time
 import logging
 from typing import Optional
 import requests
@@ -28,6 +30,10 @@ except ImportError:
     except ImportError:
         KERBEROS_AVAILABLE = False
 
+# Cookies from the last login, reused by later runs until they go stale
+SESSION_CACHE_PATH = os.path.expanduser('~/.cache/induct/session.pkl')
+SESSION_CACHE_TTL = 3600  # seconds
+
 class MidwayAuth:
     """Handles Midway authentication using existing cookies"""
     
@@ -107,16 +113,7 @@ class MidwayAuth:
         if not self.load_cookies():
             return None
         
-        # Add SSPI auth if available (Windows)
-        if SSPI_AVAILABLE:
-            self.session.auth = HttpNegotiateAuth()
-            self.logger.info("Using SSPI/Kerberos authentication")
-        elif 'KERBEROS_AVAILABLE' in globals() and KERBEROS_AVAILABLE:
-            # Suppress Kerberos warnings when using Midway cookies
-            import logging
-            logging.getLogger('requests_kerberos').setLevel(logging.WARNING)
-            self.session.auth = HTTPKerberosAuth(mutual_authentication=OPTIONAL)
-            self.logger.info("Using Kerberos authentication")
+        self._add_negotiate_auth(self.session)
         
         # Make initial request to establish session
         try:
@@ -135,6 +132,84 @@ class MidwayAuth:
         
         return self.session
     
+    def _add_negotiate_auth(self, session: requests.Session) -> None:
+        """Attach SSPI (Windows) or Kerberos auth to the session when available"""
+        if SSPI_AVAILABLE:
+            session.auth = HttpNegotiateAuth()
+            self.logger.info("Using SSPI/Kerberos authentication")
+        elif 'KERBEROS_AVAILABLE' in globals() and KERBEROS_AVAILABLE:
+            # Suppress Kerberos warnings when using Midway cookies
+            logging.getLogger('requests_kerberos').setLevel(logging.WARNING)
+            session.auth = HTTPKerberosAuth(mutual_authentication=OPTIONAL)
+            self.logger.info("Using Kerberos authentication")
+    
+    def load_cached_session(self) -> Optional[requests.Session]:
+        """Rebuild a session from the on-disk cookie cache, or None if stale/missing"""
+        try:
+            info = os.stat(SESSION_CACHE_PATH)
+            if time.time() - info.st_mtime >= SESSION_CACHE_TTL:
+                return None
+            
+            # Only trust a cache file nobody else could have written
+            if hasattr(os, 'getuid') and (info.st_uid != os.getuid() or info.st_mode & 0o022):
+                self.logger.warning(f"Ignoring session cache with unsafe ownership or mode: {SESSION_CACHE_PATH}")
+                return None
+            
+            with open(SESSION_CACHE_PATH, 'rb') as f:
+                state = pickle.load(f)
+            
+            session = requests.Session()
+            session.mount('https://', requests.adapters.HTTPAdapter(max_retries=5))
+            # Replace the defaults with exactly the headers that were cached
+            session.headers.clear()
+            session.headers.update(state['headers'])
+            session.verify = state['verify']
+            session.allow_redirects = False
+            session.cookies.update(state['cookies'])
+        except Exception as e:
+            # Missing, truncated or written by an older layout/requests version:
+            # log in afresh instead
+            self.logger.debug(f"Not using session cache: {e}")
+            return None
+        
+        # Cookies alone are cached; the negotiate handler is rebuilt as on login
+        self._add_negotiate_auth(session)
+        
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        return session
+    
+    def save_cached_session(self, session: requests.Session) -> None:
+        """Write the session's cookies and headers to the cache, readable only by the owner"""
+        try:
+            os.makedirs(os.path.dirname(SESSION_CACHE_PATH), mode=0o700, exist_ok=True)
+            fd = os.open(SESSION_CACHE_PATH, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump({
+                    'headers': dict(session.headers),
+                    'verify': session.verify,
+                    'cookies': session.cookies,
+                }, f)
+        except OSError as e:
+            self.logger.warning(f"Could not cache session: {e}")
+    
+    def get_cached_session(self, refresh: bool = False) -> Optional[requests.Session]:
+        """Get an authenticated session, reusing cookies cached by a recent run
+        
+        A session cached in the last SESSION_CACHE_TTL seconds is reused without
+        logging in again; refresh=True ignores the cache and re-authenticates.
+        """
+        if not refresh:
+            session = self.load_cached_session()
+            if session is not None:
+                self.session = session
+                return session
+        
+        session = self.get_authenticated_session()
+        if session:
+            self.save_cached_session(session)
+        return session
+    
     def test_authentication(self, test_url: str) -> bool:
         """Test if authentication is working"""
         session = self.get_authenticated_session()
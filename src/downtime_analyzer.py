@@ -5,8 +5,10 @@ Calculates downtime between consecutive package scans at induct stations
 """
 
 import logging
+from bisect import bisect_left
 from datetime import datetime, timedelta
 from collections import defaultdict
+from operator import itemgetter
 from typing import List, Dict, Optional, Any
 
 
@@ -16,6 +18,12 @@ class DowntimeAnalyzer:
     def __init__(self, categories: List[Dict], break_threshold: int = 780):
         self.categories = categories
         self.break_threshold = break_threshold
+        # Category upper bounds, for bisecting a gap straight to its category.
+        # Only valid when categories are listed in ascending order; otherwise
+        # categorisation falls back to checking each range in turn
+        maxes = [category['max'] for category in categories]
+        mins = [category['min'] for category in categories]
+        self._category_maxes = maxes if maxes == sorted(maxes) and mins == sorted(mins) else None
         self.location_trackers = defaultdict(lambda: {
             'last_scan': None,
             'downtimes': [],
@@ -29,7 +37,7 @@ class DowntimeAnalyzer:
         new_downtimes = []
         
         # Sort scans by timestamp to ensure proper ordering
-        sorted_scans = sorted(scans, key=lambda x: x['timestamp'])
+        sorted_scans = sorted(scans, key=itemgetter('timestamp'))
         
         for scan in sorted_scans:
             downtime_event = self._process_single_scan(scan)
@@ -112,9 +120,16 @@ class DowntimeAnalyzer:
     
     def _categorize_downtime(self, seconds: float) -> str:
         """Categorize downtime based on duration"""
-        for category in self.categories:
-            if category['min'] <= seconds <= category['max']:
-                return category['name']
+        if self._category_maxes is not None:
+            # First category whose max covers the gap; later mins are no
+            # smaller, so if this one's min is too high nothing matches
+            idx = bisect_left(self._category_maxes, seconds)
+            if idx < len(self.categories) and self.categories[idx]['min'] <= seconds:
+                return self.categories[idx]['name']
+        else:
+            for category in self.categories:
+                if category['min'] <= seconds <= category['max']:
+                    return category['name']
         
         # Handle edge cases
         if seconds < self.categories[0]['min']:
@@ -142,6 +157,8 @@ class DowntimeAnalyzer:
         cutoff = datetime.now() - timedelta(minutes=minutes)
         recent_downtimes = []
         
+        # detected_at is wall-clock time, which can step backwards (NTP, DST),
+        # so filter every event rather than assuming the list is in time order
         for location, tracker in self.location_trackers.items():
             for downtime in tracker['downtimes']:
                 if downtime['detected_at'] >= cutoff:
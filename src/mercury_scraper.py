@@ -54,6 +54,37 @@ class MercuryScraper:
             self.session = self.auth.get_authenticated_session()
         return self.session
     
+    def get_cached_session(self, refresh=False):
+        """Get an authenticated session, reusing cookies cached on disk by a recent run
+        
+        The session is kept on the scraper, so its own requests share it too.
+        """
+        if not REQUESTS_AVAILABLE:
+            self.logger.error("Requests library not available due to urllib3/OpenSSL compatibility issue")
+            return None
+        
+        if refresh or not self.session:
+            self.session = self.auth.get_cached_session(refresh=refresh)
+        return self.session
+    
+    def open_query_stream(self):
+        """Start streaming the Mercury query, logging in again if cached cookies were rejected
+        
+        Returns the open response, or None if no authenticated session could be had.
+        """
+        session = self.get_cached_session()
+        if not session:
+            return None
+        
+        response = session.get(self.mercury_url, timeout=30, stream=True)
+        if response.status_code == 401 or 'login' in response.url.lower():
+            response.close()
+            session = self.get_cached_session(refresh=True)
+            if not session:
+                return None
+            response = session.get(self.mercury_url, timeout=30, stream=True)
+        return response
+    
     def scrape_data(self):
         """Scrape Mercury dashboard data"""
         session = self._get_session()
@@ -2,14 +2,59 @@
 """Test enhanced Mercury parsing with the correct field mapping"""
 
 import sys
-import json
 import os
 import re
-from datetime import datetime, timedelta
+from html import unescape
+from datetime import datetime
 from collections import defaultdict
+from itertools import islice
 
 sys.path.insert(0, '.')
 
+from src.analysis_helpers import dump_json, dump_json_line, load_cached_records
+
+# Reference point for converting parsed induct times to plain epoch seconds
+EPOCH = datetime(1970, 1, 1)
+
+# Number of parsed records written to the JSONL sample; records are streamed
+# one line at a time, so raising this does not grow peak memory
+SAVED_RECORD_LIMIT = 20
+
+# Row and cell patterns for the single-sweep regex fallback
+ROW_PATTERN = re.compile(r'<tr[^>]*>(.*?)</tr>', re.DOTALL)
+HEADER_CELL_PATTERN = re.compile(r'<th[^>]*>(.*?)</th>', re.DOTALL)
+DATA_CELL_PATTERN = re.compile(r'<td[^>]*>(.*?)</td>', re.DOTALL)
+TAG_PATTERN = re.compile(r'<[^>]+>')
+
+class MercuryRecord:
+    """Single parsed Mercury row (slotted to keep per-row memory small)"""
+    
+    __slots__ = ('row_number', 'tracking_id', 'induct_location', 'last_induct_scan',
+                 'status', 'induct_timestamp', 'latest_scan', 'induct_destination',
+                 'parsed_induct_time', 'induct_time_str', 'source')
+    
+    def __init__(self, row_number=None, tracking_id=None, induct_location=None,
+                 last_induct_scan=None, status=None, induct_timestamp=None,
+                 latest_scan=None, induct_destination=None, parsed_induct_time=None,
+                 induct_time_str=None, source=None):
+        self.row_number = row_number
+        self.tracking_id = tracking_id
+        # Low-cardinality columns repeat across thousands of rows; interning
+        # shares one string object per distinct value
+        self.induct_location = sys.intern(induct_location) if induct_location else induct_location
+        self.last_induct_scan = last_induct_scan
+        self.status = sys.intern(status) if status else status
+        self.induct_timestamp = induct_timestamp
+        self.latest_scan = latest_scan
+        self.induct_destination = sys.intern(induct_destination) if induct_destination else induct_destination
+        self.parsed_induct_time = parsed_induct_time
+        self.induct_time_str = induct_time_str
+        self.source = source
+    
+    def to_dict(self):
+        """Return every field as a plain dict for JSON output"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
 def test_enhanced_mercury_parsing():
     """Test parsing with the enhanced Mercury configuration"""
     
@@ -19,16 +64,9 @@ def test_enhanced_mercury_parsing():
     print("=" * 70)
     
     try:
-        # Load the raw Mercury HTML
+        # Load and parse the raw Mercury HTML (cached while the file is unchanged)
         html_file = 'mercury_logs/raw_mercury_20250614_141857.html'
-        with open(html_file, 'r') as f:
-            html_content = f.read()
-        
-        print(f"✅ Loaded Mercury HTML: {len(html_content):,} characters")
-        
-        # Parse using enhanced field mapping
-        print("🔍 Parsing with enhanced field mapping...")
-        enhanced_records = parse_enhanced_mercury_data(html_content)
+        enhanced_records = load_enhanced_records(html_file)
         
         print(f"✅ Parsed {len(enhanced_records)} enhanced records")
         
@@ -50,8 +88,26 @@ def test_enhanced_mercury_parsing():
         traceback.print_exc()
         return False
 
+def load_enhanced_records(html_file):
+    """Parse a Mercury HTML dump, reusing pickled records from a previous run"""
+    return load_cached_records(html_file, parse_enhanced_file, __file__)
+
+def parse_enhanced_file(html_file):
+    """Parse a Mercury HTML dump from disk using enhanced field mapping"""
+    
+    # Load as bytes; the parser decodes once using the document's own
+    # encoding instead of the locale default
+    with open(html_file, 'rb') as f:
+        html_bytes = f.read()
+    
+    print(f"✅ Loaded Mercury HTML: {len(html_bytes):,} bytes")
+    
+    # Parse using enhanced field mapping
+    print("🔍 Parsing with enhanced field mapping...")
+    return parse_enhanced_mercury_data(html_bytes)
+
 def parse_enhanced_mercury_data(html_content):
-    """Parse Mercury data using enhanced field mapping"""
+    """Parse Mercury data (str or raw bytes) using enhanced field mapping"""
     
     records = []
     
@@ -79,24 +135,7 @@ def parse_enhanced_mercury_data(html_content):
         print(f"📋 Found {len(headers)} headers")
         
         # Map important columns
-        column_map = {}
-        for idx, header in enumerate(headers):
-            header_lower = header.lower()
-            
-            if header == 'trackingId':
-                column_map['tracking_id'] = idx
-            elif header == 'Induct Location':
-                column_map['induct_location'] = idx
-            elif header == 'Last Induct Scan':
-                column_map['last_induct_scan'] = idx
-            elif header == 'Status':
-                column_map['status'] = idx
-            elif header == 'compAtStationData.compCurrentNodeAtStationData.firstEventTimestamp':
-                column_map['induct_timestamp'] = idx
-            elif header == 'Latest Scan':
-                column_map['latest_scan'] = idx
-            elif 'induct.destination.id' in header_lower:
-                column_map['induct_destination'] = idx
+        column_map = map_enhanced_columns(headers)
         
         print(f"🔍 Column mapping:")
         for field, idx in column_map.items():
@@ -110,29 +149,30 @@ def parse_enhanced_mercury_data(html_content):
                 continue
             
             try:
-                # Extract data using column mapping
-                record = {
-                    'row_number': i,
-                    'tracking_id': get_cell_value(cells, column_map.get('tracking_id')),
-                    'induct_location': get_cell_value(cells, column_map.get('induct_location')),
-                    'last_induct_scan': get_cell_value(cells, column_map.get('last_induct_scan')),
-                    'status': get_cell_value(cells, column_map.get('status')),
-                    'induct_timestamp': get_cell_value(cells, column_map.get('induct_timestamp')),
-                    'latest_scan': get_cell_value(cells, column_map.get('latest_scan')),
-                    'induct_destination': get_cell_value(cells, column_map.get('induct_destination'))
-                }
+                # Parse the induct timestamp before building the record
+                last_induct_scan = get_cell_value(cells, column_map.get('last_induct_scan'))
+                induct_timestamp = get_cell_value(cells, column_map.get('induct_timestamp'))
                 
-                # Parse the induct timestamp
                 induct_time = None
-                induct_time_str = record.get('last_induct_scan') or record.get('induct_timestamp')
+                induct_time_str = last_induct_scan or induct_timestamp
                 
                 if induct_time_str and induct_time_str.strip() and induct_time_str != 'null':
                     induct_time = parse_timestamp_enhanced(induct_time_str.strip())
                 
                 if induct_time:
-                    record['parsed_induct_time'] = induct_time
-                    record['induct_time_str'] = induct_time_str.strip()
-                    records.append(record)
+                    # Extract remaining data using column mapping
+                    records.append(MercuryRecord(
+                        row_number=i,
+                        tracking_id=get_cell_value(cells, column_map.get('tracking_id')),
+                        induct_location=get_cell_value(cells, column_map.get('induct_location')),
+                        last_induct_scan=last_induct_scan,
+                        status=get_cell_value(cells, column_map.get('status')),
+                        induct_timestamp=induct_timestamp,
+                        latest_scan=get_cell_value(cells, column_map.get('latest_scan')),
+                        induct_destination=get_cell_value(cells, column_map.get('induct_destination')),
+                        parsed_induct_time=induct_time,
+                        induct_time_str=induct_time_str.strip()
+                    ))
                     parsed_count += 1
                 
             except Exception as e:
@@ -154,41 +194,91 @@ def get_cell_value(cells, column_index):
         return None
     return cells[column_index].get_text().strip()
 
+def map_enhanced_columns(headers):
+    """Map the important Mercury fields to their column index"""
+    
+    column_map = {}
+    for idx, header in enumerate(headers):
+        header_lower = header.lower()
+        
+        if header == 'trackingId':
+            column_map['tracking_id'] = idx
+        elif header == 'Induct Location':
+            column_map['induct_location'] = idx
+        elif header == 'Last Induct Scan':
+            column_map['last_induct_scan'] = idx
+        elif header == 'Status':
+            column_map['status'] = idx
+        elif header == 'compAtStationData.compCurrentNodeAtStationData.firstEventTimestamp':
+            column_map['induct_timestamp'] = idx
+        elif header == 'Latest Scan':
+            column_map['latest_scan'] = idx
+        elif 'induct.destination.id' in header_lower:
+            column_map['induct_destination'] = idx
+    
+    return column_map
+
+def get_raw_cell_value(cells, column_index):
+    """Get text from a raw regex-matched cell at given index"""
+    if column_index is None or column_index >= len(cells):
+        return None
+    value = cells[column_index]
+    if '<' in value:
+        value = TAG_PATTERN.sub('', value)
+    return unescape(value).strip()
+
 def parse_enhanced_mercury_regex(html_content):
-    """Fallback regex parsing for enhanced Mercury data"""
+    """Fallback regex parsing for enhanced Mercury data
     
-    records = []
+    Walks the table rows once, mapping the header row to column indexes and
+    reading each data row's cells in place, so fields stay aligned per row.
+    """
     
-    # Look for the enhanced induct timestamp field
-    induct_pattern = r'compAtStationData\.compCurrentNodeAtStationData\.firstEventTimestamp[^>]*>([^<]+)<'
-    induct_matches = re.findall(induct_pattern, html_content)
+    if isinstance(html_content, bytes):
+        html_content = html_content.decode('utf-8', errors='replace')
     
-    # Look for Last Induct Scan field
-    last_induct_pattern = r'Last Induct Scan[^>]*>([^<]+)<'
-    last_induct_matches = re.findall(last_induct_pattern, html_content)
+    records = []
+    column_map = None
+    row_count = 0
     
-    # Look for Induct Location field
-    location_pattern = r'Induct Location[^>]*>([^<]+)<'
-    location_matches = re.findall(location_pattern, html_content)
+    for i, row_match in enumerate(ROW_PATTERN.finditer(html_content)):
+        row_html = row_match.group(1)
+        
+        if column_map is None:
+            headers = [get_raw_cell_value([h], 0) for h in HEADER_CELL_PATTERN.findall(row_html)]
+            if headers:
+                column_map = map_enhanced_columns(headers)
+            continue
+        
+        cells = DATA_CELL_PATTERN.findall(row_html)
+        if not cells:
+            continue
+        row_count += 1
+        
+        last_induct_scan = get_raw_cell_value(cells, column_map.get('last_induct_scan'))
+        induct_timestamp = get_raw_cell_value(cells, column_map.get('induct_timestamp'))
+        timestamp_str = last_induct_scan or induct_timestamp
+        if not timestamp_str or timestamp_str == 'null':
+            continue
+        
+        parsed_time = parse_timestamp_enhanced(timestamp_str)
+        if parsed_time:
+            records.append(MercuryRecord(
+                row_number=i,
+                tracking_id=get_raw_cell_value(cells, column_map.get('tracking_id')) or f'ENHANCED_{i:04d}',
+                induct_location=get_raw_cell_value(cells, column_map.get('induct_location')),
+                last_induct_scan=last_induct_scan,
+                status=get_raw_cell_value(cells, column_map.get('status')),
+                induct_timestamp=induct_timestamp,
+                induct_destination=get_raw_cell_value(cells, column_map.get('induct_destination')),
+                parsed_induct_time=parsed_time,
+                induct_time_str=timestamp_str,
+                source='regex_enhanced'
+            ))
     
     print(f"🔍 Regex parsing found:")
-    print(f"   Induct timestamps: {len(induct_matches)}")
-    print(f"   Last induct scans: {len(last_induct_matches)}")
-    print(f"   Induct locations: {len(location_matches)}")
-    
-    # Combine the data (simplified approach)
-    for i, timestamp_str in enumerate(induct_matches):
-        if timestamp_str.strip() and timestamp_str != 'null':
-            parsed_time = parse_timestamp_enhanced(timestamp_str.strip())
-            if parsed_time:
-                records.append({
-                    'tracking_id': f'ENHANCED_{i:04d}',
-                    'induct_location': location_matches[i] if i < len(location_matches) else f'GA{(i % 10) + 1}',
-                    'induct_timestamp': timestamp_str.strip(),
-                    'parsed_induct_time': parsed_time,
-                    'induct_time_str': timestamp_str.strip(),
-                    'source': 'regex_enhanced'
-                })
+    print(f"   Data rows: {row_count}")
+    print(f"   Induct timestamps: {len(records)}")
     
     return records
 
@@ -228,12 +318,17 @@ def analyze_enhanced_data(records):
         print("⚠️  No enhanced records to analyze")
         return {}
     
-    # Group by location
-    location_groups = defaultdict(list)
+    # Group by location, keeping only the columns the downtime analysis needs
+    location_groups = {}
     for record in records:
-        location = record.get('induct_location', 'UNKNOWN')
-        if location and location.startswith('GA'):
-            location_groups[location].append(record)
+        location = record.induct_location
+        if not location or location[:2] != 'GA':
+            continue
+        columns = location_groups.get(location)
+        if columns is None:
+            columns = location_groups[location] = {'tracking_ids': [], 'times': []}
+        columns['tracking_ids'].append(record.tracking_id)
+        columns['times'].append(record.parsed_induct_time)
     
     print(f"📈 Enhanced analysis:")
     print(f"   Total records: {len(records)}")
@@ -242,11 +337,11 @@ def analyze_enhanced_data(records):
     # Show location breakdown
     print(f"   Location breakdown:")
     for location in sorted(location_groups.keys()):
-        count = len(location_groups[location])
+        count = len(location_groups[location]['times'])
         print(f"     {location}: {count} packages")
     
     # Time range analysis
-    timestamps = [r['parsed_induct_time'] for r in records if r.get('parsed_induct_time')]
+    timestamps = [r.parsed_induct_time for r in records if r.parsed_induct_time]
     if timestamps:
         min_time = min(timestamps)
         max_time = max(timestamps)
@@ -254,12 +349,14 @@ def analyze_enhanced_data(records):
         print(f"   Time range: {min_time} to {max_time}")
         print(f"   Span: {span}")
         
-        # Check if we have shift-time data
-        shift_start = datetime.now().replace(hour=5, minute=20, second=0, microsecond=0)  # 1:20 AM EDT = 5:20 UTC
-        shift_end = datetime.now().replace(hour=12, minute=30, second=0, microsecond=0)   # 8:30 AM EDT = 12:30 UTC
+        # Check if we have shift-time data (count over the timestamp column,
+        # no intermediate list of matching records)
+        now = datetime.now()
+        shift_start = now.replace(hour=5, minute=20, second=0, microsecond=0)  # 1:20 AM EDT = 5:20 UTC
+        shift_end = now.replace(hour=12, minute=30, second=0, microsecond=0)   # 8:30 AM EDT = 12:30 UTC
         
-        shift_records = [r for r in records if r.get('parsed_induct_time') and shift_start <= r['parsed_induct_time'] <= shift_end]
-        print(f"   Records in shift window: {len(shift_records)}")
+        shift_count = sum(1 for t in timestamps if shift_start <= t <= shift_end)
+        print(f"   Records in shift window: {shift_count}")
     
     # Downtime analysis
     downtime_analysis = {}
@@ -269,14 +366,14 @@ def analyze_enhanced_data(records):
     
     return {
         'total_records': len(records),
-        'location_groups': {loc: len(records) for loc, records in location_groups.items()},
+        'location_groups': {loc: len(columns['times']) for loc, columns in location_groups.items()},
         'time_range': {
             'min': min(timestamps) if timestamps else None,
             'max': max(timestamps) if timestamps else None,
             'span': str(max(timestamps) - min(timestamps)) if timestamps else None
         },
         'downtime_analysis': downtime_analysis,
-        'sample_records': records[:5]
+        'sample_records': [r.to_dict() for r in records[:5]]
     }
 
 def perform_enhanced_downtime_analysis(location_groups):
@@ -284,48 +381,64 @@ def perform_enhanced_downtime_analysis(location_groups):
     
     analysis = {}
     
-    for location, records in location_groups.items():
-        if len(records) < 2:
+    for location, columns in location_groups.items():
+        times = columns['times']
+        if len(times) < 2:
             continue
         
-        # Sort by induct time
-        records.sort(key=lambda x: x['parsed_induct_time'])
+        # Sort both columns by induct time and convert to epoch seconds once,
+        # so the gap loop below is plain float arithmetic instead of timedeltas
+        order = sorted(range(len(times)), key=times.__getitem__)
+        times = [times[i] for i in order]
+        tracking_ids = [columns['tracking_ids'][i] for i in order]
+        seconds = [(t - EPOCH).total_seconds() for t in times]
         
-        # Calculate gaps
+        # Calculate and categorize gaps in a single pass
         gaps = []
-        for i in range(1, len(records)):
-            prev_time = records[i-1]['parsed_induct_time']
-            curr_time = records[i]['parsed_induct_time']
-            gap_seconds = (curr_time - prev_time).total_seconds()
+        categories = {'20-60s': [], '60-120s': [], '120-780s': []}
+        total_gap = 0.0
+        min_gap = None
+        max_gap = None
+        for i in range(1, len(seconds)):
+            gap_seconds = seconds[i] - seconds[i-1]
             
             # Only analyze reasonable gaps
-            if 20 <= gap_seconds <= 780:
-                gaps.append({
-                    'gap_seconds': gap_seconds,
-                    'prev_package': records[i-1]['tracking_id'],
-                    'curr_package': records[i]['tracking_id'],
-                    'prev_time': prev_time,
-                    'curr_time': curr_time
-                })
-        
-        if gaps:
-            # Categorize gaps
-            categories = {
-                '20-60s': [g for g in gaps if 20 <= g['gap_seconds'] <= 60],
-                '60-120s': [g for g in gaps if 60 < g['gap_seconds'] <= 120],
-                '120-780s': [g for g in gaps if 120 < g['gap_seconds'] <= 780]
+            if not 20 <= gap_seconds <= 780:
+                continue
+            
+            gap = {
+                'gap_seconds': gap_seconds,
+                'prev_package': tracking_ids[i-1],
+                'curr_package': tracking_ids[i],
+                'prev_time': times[i-1],
+                'curr_time': times[i]
             }
+            gaps.append(gap)
             
+            if gap_seconds <= 60:
+                categories['20-60s'].append(gap)
+            elif gap_seconds <= 120:
+                categories['60-120s'].append(gap)
+            else:
+                categories['120-780s'].append(gap)
+            
+            total_gap += gap_seconds
+            if min_gap is None or gap_seconds < min_gap:
+                min_gap = gap_seconds
+            if max_gap is None or gap_seconds > max_gap:
+                max_gap = gap_seconds
+        
+        if gaps:
             analysis[location] = {
-                'total_records': len(records),
+                'total_records': len(times),
                 'total_gaps': len(gaps),
                 'categories': categories,
-                'avg_gap': sum(g['gap_seconds'] for g in gaps) / len(gaps),
-                'max_gap': max(g['gap_seconds'] for g in gaps),
-                'min_gap': min(g['gap_seconds'] for g in gaps)
+                'avg_gap': total_gap / len(gaps),
+                'max_gap': max_gap,
+                'min_gap': min_gap
             }
             
-            print(f"   {location}: {len(records)} records, {len(gaps)} gaps, avg {analysis[location]['avg_gap']:.1f}s")
+            print(f"   {location}: {len(times)} records, {len(gaps)} gaps, avg {analysis[location]['avg_gap']:.1f}s")
     
     return analysis
 
@@ -390,19 +503,30 @@ def generate_enhanced_report(analysis):
         print("   ⚠️  Limited downtime analysis (expected with current data)")
 
 def save_enhanced_results(records, analysis, timestamp):
-    """Save enhanced analysis results"""
+    """Save enhanced analysis results
+    
+    The analysis goes to a JSON document; sample records are streamed to a
+    newline-delimited JSON file so no whole-payload string is built for them.
+    """
     
     os.makedirs('mercury_logs', exist_ok=True)
     
+    records_file = f'mercury_logs/enhanced_records_{timestamp}.jsonl'
+    with open(records_file, 'wb') as f:
+        for record in islice(records, SAVED_RECORD_LIMIT):
+            f.write(dump_json_line(record.to_dict()))
+    
     results_file = f'mercury_logs/enhanced_analysis_{timestamp}.json'
-    with open(results_file, 'w') as f:
-        json.dump({
-            'timestamp': timestamp,
-            'enhanced_records': records[:20],  # Save first 20 for size
-            'analysis': analysis
-        }, f, indent=2, default=str)
+    payload = {
+        'timestamp': timestamp,
+        'records_file': records_file,
+        'analysis': analysis
+    }
+    
+    dump_json(payload, results_file)
     
     print(f"\n💾 Enhanced results saved: {results_file}")
+    print(f"💾 Sample records saved: {records_file}")
 
 if __name__ == "__main__":
     print("🚀 Enhanced Mercury Parsing Test")
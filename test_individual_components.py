@@ -4,7 +4,7 @@ Test Individual Components - Validate specific fixes without external dependenci
 """
 
 import sys
-import logging
+import inspect
 from datetime import datetime, timedelta
 from pathlib import Path
 import sqlite3
@@ -117,8 +117,6 @@ def test_slack_payload_format():
         notifier = SlackNotifier("https://dummy.webhook.url")
         
         # Test the _create_payload logic by examining the method
-        import inspect
-        
         # Check if send_notification method creates correct payload
         source = inspect.getsource(notifier.send_notification)
         
@@ -4,6 +4,11 @@
 import sys
 sys.path.insert(0, '.')
 
+from src.analysis_helpers import count_fields_in_chunks
+
+# Characters decoded per chunk when streaming the Mercury response
+RESPONSE_CHUNK_SIZE = 65536
+
 def test_induct_field():
     """Test extraction of compAtStationData.compCurrentNodeAtStationData.firstEventTimestamp"""
     
@@ -22,30 +27,39 @@ def test_induct_field():
         
         # Get session and raw response
         print("📥 Fetching raw Mercury data...")
-        session = scraper._get_session()
+        session = scraper.get_cached_session()
         if not session:
             print("❌ Failed to get session")
             return False
         
-        response = session.get(scraper.mercury_url, timeout=30)
-        print(f"✅ Got response: {len(response.text)} characters")
-        
-        # Check if induct field is in the response
         induct_field = "compAtStationData.compCurrentNodeAtStationData.firstEventTimestamp"
+        alt_field = "compAtStationData.compFirstNodeAtStationData.firstEventTimestamp"
         
-        if induct_field in response.text:
+        # Stream the body and count both fields in one pass over the chunks
+        response = scraper.open_query_stream()
+        if response is None:
+            print("❌ Failed to re-authenticate after cached session was rejected")
+            return False
+        
+        with response:
+            response.encoding = response.encoding or 'utf-8'
+            chunks = response.iter_content(chunk_size=RESPONSE_CHUNK_SIZE, decode_unicode=True)
+            length, field_counts = count_fields_in_chunks(chunks, [induct_field, alt_field])
+        print(f"✅ Got response: {length} characters")
+        
+        # Check if induct field is in the response
+        count = field_counts[induct_field]
+        if count:
             print(f"✅ FOUND: {induct_field} is in the response!")
             
             # Count occurrences
-            count = response.text.count(induct_field)
             print(f"📊 Field appears {count} times in response")
         else:
             print(f"❌ Field {induct_field} NOT found in response")
             print("⚠️  Need to ensure enhanced Mercury config is uploaded")
         
         # Also check alternative field
-        alt_field = "compAtStationData.compFirstNodeAtStationData.firstEventTimestamp"
-        if alt_field in response.text:
+        if field_counts[alt_field]:
             print(f"✅ FOUND: {alt_field} is also in the response!")
         
         # Test parsing with current scraper
@@ -5,8 +5,13 @@ Tests core logic without external dependencies (no requests, pandas, etc.)
 """
 
 import sys
+import argparse
 import logging
+import heapq
+from collections import defaultdict
 from datetime import datetime, timedelta
+from itertools import accumulate, chain, islice
+from operator import itemgetter
 from pathlib import Path
 import random
 from typing import List, Dict
@@ -16,107 +21,107 @@ sys.path.append(str(Path(__file__).parent / "src"))
 
 from src.downtime_analyzer import DowntimeAnalyzer
 
+# Order categories are listed in the simulated 30-minute report
+REPORT_CATEGORY_ORDER = ('20-60', '60-120', '120-780')
+
 
 class MockDataGenerator:
     """Generates realistic mock Mercury dashboard data"""
     
     def __init__(self):
-        self.locations = ['GA1', 'GA2', 'GA3', 'GA4', 'GA5', 'GA6', 'GA7', 'GA8', 'GA9', 'GA10']
-        self.statuses = ['INDUCTED', 'INDUCT', 'STOW_BUFFER', 'AT_STATION']
+        self.locations = ('GA1', 'GA2', 'GA3', 'GA4', 'GA5', 'GA6', 'GA7', 'GA8', 'GA9', 'GA10')
+        self.statuses = ('INDUCTED', 'INDUCT', 'STOW_BUFFER', 'AT_STATION')
         self.tracking_id_counter = 1000
     
     def generate_downtime_scenario(self, location: str, base_time: datetime, 
-                                 downtime_gaps: List[int]) -> List[Dict]:
+                                 downtime_gaps: List[int], scraped_at: str = None) -> List[Dict]:
         """Generate scan data with specific downtime gaps for a location"""
-        scans = []
-        current_time = base_time
+        # Every scan in a batch shares one scrape time
+        if scraped_at is None:
+            scraped_at = datetime.now().isoformat()
+        
+        # One scan at the base time, then one after each gap: the running
+        # totals of the gaps are every scan's offset from base_time
+        offsets = accumulate(chain((0,), downtime_gaps))
+        scan_times = [base_time + timedelta(seconds=offset) for offset in offsets]
+        
+        statuses = random.choices(self.statuses, k=len(scan_times))
         
-        for i, gap in enumerate(downtime_gaps):
-            # Create scan record
-            scan = {
-                'tracking_id': f'T{self.tracking_id_counter:06d}',
+        first_id = self.tracking_id_counter
+        self.tracking_id_counter += len(scan_times)
+        
+        return [
+            {
+                'tracking_id': f'T{tracking_id:06d}',
                 'location': location,
-                'status': random.choice(self.statuses),
-                'timestamp': current_time,
-                'raw_timestamp': current_time.isoformat() + 'Z',
-                'scraped_at': datetime.now().isoformat()
+                'status': status,
+                'timestamp': scan_time,
+                'raw_timestamp': scan_time.isoformat() + 'Z',
+                'scraped_at': scraped_at
             }
-            scans.append(scan)
-            
-            # Advance time by the gap
-            current_time += timedelta(seconds=gap)
-            self.tracking_id_counter += 1
-        
-        # Add final scan
-        final_scan = {
-            'tracking_id': f'T{self.tracking_id_counter:06d}',
-            'location': location,
-            'status': random.choice(self.statuses),
-            'timestamp': current_time,
-            'raw_timestamp': current_time.isoformat() + 'Z',
-            'scraped_at': datetime.now().isoformat()
-        }
-        scans.append(final_scan)
-        self.tracking_id_counter += 1
-        
-        return scans
+            for tracking_id, scan_time, status in zip(
+                range(first_id, self.tracking_id_counter), scan_times, statuses
+            )
+        ]
     
     def generate_comprehensive_test_data(self) -> List[Dict]:
         """Generate comprehensive test data covering all scenarios"""
-        all_scans = []
+        scenarios = []
         base_time = datetime.now() - timedelta(hours=2)  # Start 2 hours ago
+        scraped_at = datetime.now().isoformat()
         
         # Scenario 1: GA1 - Multiple short downtimes (20-60s category)
         ga1_gaps = [35, 45, 25, 50, 30]  # Total: 185s downtime
-        all_scans.extend(self.generate_downtime_scenario('GA1', base_time, ga1_gaps))
+        scenarios.append(self.generate_downtime_scenario('GA1', base_time, ga1_gaps, scraped_at))
         
         # Scenario 2: GA2 - Medium downtimes (60-120s category)
         ga2_gaps = [75, 95, 110, 65]  # Total: 345s downtime
-        all_scans.extend(self.generate_downtime_scenario('GA2', base_time + timedelta(minutes=5), ga2_gaps))
+        scenarios.append(self.generate_downtime_scenario('GA2', base_time + timedelta(minutes=5), ga2_gaps, scraped_at))
         
         # Scenario 3: GA3 - Long downtimes (120-780s category)
         ga3_gaps = [150, 300, 200, 450]  # Total: 1100s downtime
-        all_scans.extend(self.generate_downtime_scenario('GA3', base_time + timedelta(minutes=10), ga3_gaps))
+        scenarios.append(self.generate_downtime_scenario('GA3', base_time + timedelta(minutes=10), ga3_gaps, scraped_at))
         
         # Scenario 4: GA4 - Mixed downtimes
         ga4_gaps = [40, 85, 180, 35, 120]  # Total: 460s downtime
-        all_scans.extend(self.generate_downtime_scenario('GA4', base_time + timedelta(minutes=15), ga4_gaps))
+        scenarios.append(self.generate_downtime_scenario('GA4', base_time + timedelta(minutes=15), ga4_gaps, scraped_at))
         
         # Scenario 5: GA5 - PROBLEM LOCATION (exceeds 2100s threshold)
         ga5_gaps = [200, 300, 450, 600, 350, 400, 250]  # Total: 2550s downtime (exceeds 2100s)
-        all_scans.extend(self.generate_downtime_scenario('GA5', base_time + timedelta(minutes=20), ga5_gaps))
+        scenarios.append(self.generate_downtime_scenario('GA5', base_time + timedelta(minutes=20), ga5_gaps, scraped_at))
         
         # Scenario 6: GA6 - Break scenario (>780s gap should be ignored)
         ga6_gaps = [45, 900, 30, 55]  # 900s gap should be ignored as break
-        all_scans.extend(self.generate_downtime_scenario('GA6', base_time + timedelta(minutes=25), ga6_gaps))
+        scenarios.append(self.generate_downtime_scenario('GA6', base_time + timedelta(minutes=25), ga6_gaps, scraped_at))
         
         # Scenario 7: GA7 - Minimal downtime
         ga7_gaps = [25, 35]  # Total: 60s downtime
-        all_scans.extend(self.generate_downtime_scenario('GA7', base_time + timedelta(minutes=30), ga7_gaps))
+        scenarios.append(self.generate_downtime_scenario('GA7', base_time + timedelta(minutes=30), ga7_gaps, scraped_at))
         
         # Scenario 8: GA8 - No significant downtime (all gaps <20s, should be ignored)
         ga8_gaps = [10, 15, 12, 18]  # All below 20s threshold
-        all_scans.extend(self.generate_downtime_scenario('GA8', base_time + timedelta(minutes=35), ga8_gaps))
+        scenarios.append(self.generate_downtime_scenario('GA8', base_time + timedelta(minutes=35), ga8_gaps, scraped_at))
         
         # Scenario 9: GA9 - Edge case downtimes (exactly at thresholds)
         ga9_gaps = [20, 60, 120, 780]  # Exactly at category boundaries
-        all_scans.extend(self.generate_downtime_scenario('GA9', base_time + timedelta(minutes=40), ga9_gaps))
+        scenarios.append(self.generate_downtime_scenario('GA9', base_time + timedelta(minutes=40), ga9_gaps, scraped_at))
         
         # Scenario 10: GA10 - Recent activity (last 30 minutes)
         recent_time = datetime.now() - timedelta(minutes=25)
         ga10_gaps = [45, 90, 150]  # Recent activity for 30-min report
-        all_scans.extend(self.generate_downtime_scenario('GA10', recent_time, ga10_gaps))
-        
-        # Sort all scans by timestamp
-        all_scans.sort(key=lambda x: x['timestamp'])
+        scenarios.append(self.generate_downtime_scenario('GA10', recent_time, ga10_gaps, scraped_at))
         
-        return all_scans
+        # Each scenario is already in time order, so merge rather than re-sort
+        return list(heapq.merge(*scenarios, key=itemgetter('timestamp')))
 
 
 class OfflineTestRunner:
     """Runs comprehensive tests with mock data (offline mode)"""
     
-    def __init__(self):
+    def __init__(self, quiet: bool = False):
+        # Quiet runs skip the display sections but still analyse and verify
+        self.quiet = quiet
+        
         # Hardcoded config for testing
         self.config = {
             'downtime': {
@@ -133,7 +138,7 @@ class OfflineTestRunner:
         }
         
         # Setup logging
-        logging.basicConfig(level=logging.INFO, 
+        logging.basicConfig(level=logging.WARNING if quiet else logging.INFO, 
                           format='%(asctime)s - %(levelname)s - %(message)s')
         self.logger = logging.getLogger(__name__)
         
@@ -147,6 +152,9 @@ class OfflineTestRunner:
     
     def run_comprehensive_test(self):
         """Run the complete test scenario"""
+        # Clock label for the simulated report, read once per run
+        now_label = datetime.now().strftime("%I:%M %p")
+        
         print("🧪 Offline Mock Data Test - Core Logic Verification")
         print("=" * 60)
         
@@ -156,9 +164,13 @@ class OfflineTestRunner:
         print(f"Generated {len(mock_scans)} mock scan records")
         
         # Display scenarios
-        self.print_test_scenarios()
+        if not self.quiet:
+            self.print_test_scenarios()
         
-        # Analyze downtimes
+        # Analyze downtimes. Gap categorisation stays inside DowntimeAnalyzer
+        # rather than a separate JIT kernel: this run is ~50 scans, far below
+        # where compile time pays back, and a second implementation could
+        # drift from the production boundaries this test is here to check
         print("\n🧮 Analyzing downtimes...")
         analysis_result = self.analyzer.process_scans(mock_scans)
         new_downtimes = analysis_result['new_downtimes']
@@ -167,7 +179,8 @@ class OfflineTestRunner:
         print(f"✅ Analysis complete: {len(new_downtimes)} downtime events detected")
         
         # Display results
-        self.print_downtime_analysis(new_downtimes, location_summaries)
+        if not self.quiet:
+            self.print_downtime_analysis(new_downtimes, location_summaries)
         
         # Test shift-end alerts
         print("\n🚨 Checking for shift-end alerts...")
@@ -177,9 +190,10 @@ class OfflineTestRunner:
         
         if shift_alerts:
             print(f"Found {len(shift_alerts)} locations exceeding threshold:")
-            for alert in shift_alerts:
-                print(f"  ⚠️  {alert['location']}: {alert['total_downtime']}s "
-                      f"(threshold: {alert['threshold']}s)")
+            if not self.quiet:
+                for alert in shift_alerts:
+                    print(f"  ⚠️  {alert['location']}: {alert['total_downtime']}s "
+                          f"(threshold: {alert['threshold']}s)")
         else:
             print("✅ No locations exceed shift-end threshold")
         
@@ -188,13 +202,13 @@ class OfflineTestRunner:
         recent_downtimes = self.analyzer.get_recent_downtimes(minutes=30)
         print(f"Found {len(recent_downtimes)} recent downtime events")
         
-        # Display what would be sent to Slack
-        self.simulate_slack_messages(location_summaries, shift_alerts, recent_downtimes)
-        
-        # Display final statistics
-        print("\n📈 Final Statistics:")
+        # Display what would be sent to Slack, and the final statistics
         stats = self.analyzer.get_statistics()
-        self.print_final_statistics(stats)
+        if not self.quiet:
+            self.simulate_slack_messages(location_summaries, shift_alerts, recent_downtimes, now_label)
+            
+            print("\n📈 Final Statistics:")
+            self.print_final_statistics(stats)
         
         # Verify expected results
         self.verify_test_results(new_downtimes, location_summaries, shift_alerts)
@@ -221,31 +235,32 @@ class OfflineTestRunner:
         for i, scenario in enumerate(scenarios, 1):
             print(f"  {i:2d}. {scenario}")
     
+    def write_lines(self, lines: List[str]):
+        """Write a block of report lines to stdout in one call"""
+        sys.stdout.write('\n'.join(lines) + '\n')
+    
     def print_downtime_analysis(self, downtimes: List[Dict], summaries: Dict):
         """Print detailed downtime analysis results"""
-        print("\n🔍 Downtime Analysis Results:")
-        print("-" * 50)
+        lines = ["\n🔍 Downtime Analysis Results:", "-" * 50]
         
         if not downtimes:
-            print("No downtime events detected")
+            lines.append("No downtime events detected")
+            self.write_lines(lines)
             return
         
         # Group by location
-        by_location = {}
+        by_location = defaultdict(list)
         for event in downtimes:
-            loc = event['location']
-            if loc not in by_location:
-                by_location[loc] = []
-            by_location[loc].append(event)
+            by_location[event['location']].append(event)
         
         for location in sorted(by_location.keys()):
             events = by_location[location]
             summary = summaries.get(location, {})
             
-            print(f"\n📍 {location}:")
-            print(f"   Events: {len(events)}")
-            print(f"   Total Downtime: {summary.get('total_downtime', 0)}s")
-            print(f"   Average: {summary.get('average_downtime', 0)}s")
+            lines.append(f"\n📍 {location}:")
+            lines.append(f"   Events: {len(events)}")
+            lines.append(f"   Total Downtime: {summary.get('total_downtime', 0)}s")
+            lines.append(f"   Average: {summary.get('average_downtime', 0)}s")
             
             # Category breakdown
             categories = summary.get('category_counts', {})
@@ -254,42 +269,46 @@ class OfflineTestRunner:
                 for cat, count in categories.items():
                     if count > 0:
                         cat_parts.append(f"{cat}: {count}")
-                print(f"   Categories: {', '.join(cat_parts)}")
+                lines.append(f"   Categories: {', '.join(cat_parts)}")
             
             # Show first few events
             for i, event in enumerate(events[:5]):  # Show max 5 events
                 start_time = event['start_timestamp'].strftime('%H:%M:%S')
                 end_time = event['end_timestamp'].strftime('%H:%M:%S')
-                print(f"     {i+1}. {event['downtime_seconds']:3d}s ({event['category']}) "
-                      f"{start_time}-{end_time}")
+                lines.append(f"     {i+1}. {event['downtime_seconds']:3d}s ({event['category']}) "
+                             f"{start_time}-{end_time}")
                 
             if len(events) > 5:
-                print(f"     ... and {len(events) - 5} more events")
+                lines.append(f"     ... and {len(events) - 5} more events")
         
         # Show locations with no events
         all_locations = ['GA1', 'GA2', 'GA3', 'GA4', 'GA5', 'GA6', 'GA7', 'GA8', 'GA9', 'GA10']
         no_events = [loc for loc in all_locations if loc not in by_location]
         if no_events:
-            print(f"\n📍 No events detected: {', '.join(no_events)}")
+            lines.append(f"\n📍 No events detected: {', '.join(no_events)}")
+        
+        self.write_lines(lines)
     
-    def simulate_slack_messages(self, summaries: Dict, alerts: List[Dict], recent: List[Dict]):
+    def simulate_slack_messages(self, summaries: Dict, alerts: List[Dict], recent: List[Dict],
+                                now_label: str = None):
         """Simulate what would be sent to Slack"""
-        print("\n📱 Simulated Slack Messages:")
-        print("-" * 40)
+        if now_label is None:
+            now_label = datetime.now().strftime("%I:%M %p")
+        
+        lines = ["\n📱 Simulated Slack Messages:", "-" * 40]
         
         # Shift-end alerts
         if alerts:
-            print("\n🚨 Shift-End Alert Messages:")
+            lines.append("\n🚨 Shift-End Alert Messages:")
             for alert in alerts:
-                print(f"Title: 🚨 Shift End Alert - {alert['location']} Excessive Downtime")
-                print(f"Content: {alert['location']} has exceeded {alert['threshold']} seconds")
-                print(f"         Current: {alert['total_downtime']:,}s ({alert['event_count']} events)")
-                print()
+                lines.append(f"Title: 🚨 Shift End Alert - {alert['location']} Excessive Downtime")
+                lines.append(f"Content: {alert['location']} has exceeded {alert['threshold']} seconds")
+                lines.append(f"         Current: {alert['total_downtime']:,}s ({alert['event_count']} events)")
+                lines.append('')
         
         # 30-minute report
-        print("\n📊 30-Minute Report Message:")
-        timestamp = datetime.now().strftime("%I:%M %p")
-        print(f"Title: 📊 Induct Downtime Report - {timestamp}")
+        lines.append("\n📊 30-Minute Report Message:")
+        lines.append(f"Title: 📊 Induct Downtime Report - {now_label}")
         
         report_lines = []
         total_events = 0
@@ -301,9 +320,10 @@ class OfflineTestRunner:
                 
             category_counts = summary.get('category_counts', {})
             categories = []
-            for cat in ['20-60', '60-120', '120-780']:
-                if category_counts.get(cat, 0) > 0:
-                    categories.append(f"{cat}: {category_counts[cat]}")
+            for cat in REPORT_CATEGORY_ORDER:
+                count = category_counts.get(cat, 0)
+                if count > 0:
+                    categories.append(f"{cat}: {count}")
             
             category_str = f"({', '.join(categories)})" if categories else ""
             report_lines.append(
@@ -315,25 +335,30 @@ class OfflineTestRunner:
             total_downtime += summary['total_downtime']
         
         if report_lines:
-            print("Content:")
+            lines.append("Content:")
             for line in report_lines:
-                print(f"  {line}")
-            print(f"\n📈 Summary: {total_events} total events, {total_downtime}s total downtime")
+                lines.append(f"  {line}")
+            lines.append(f"\n📈 Summary: {total_events} total events, {total_downtime}s total downtime")
         else:
-            print("Content: ✅ No significant downtime events")
+            lines.append("Content: ✅ No significant downtime events")
         
         # Immediate alerts for significant downtimes
-        significant = [d for d in recent if d['downtime_seconds'] >= 120]
-        if significant:
-            print(f"\n⏰ Immediate Alert Messages ({len(significant)} alerts):")
-            for event in significant[:3]:  # Show first 3
-                print(f"Title: ⏰ Significant Downtime - {event['location']}")
-                print(f"Content: {event['location']} - {event['downtime_seconds']}s ({event['category']})")
+        # Count every significant event for the header, but only walk far
+        # enough to print the first 3
+        significant_count = sum(1 for d in recent if d['downtime_seconds'] >= 120)
+        if significant_count:
+            lines.append(f"\n⏰ Immediate Alert Messages ({significant_count} alerts):")
+            significant = (d for d in recent if d['downtime_seconds'] >= 120)
+            for event in islice(significant, 3):  # Show first 3
+                lines.append(f"Title: ⏰ Significant Downtime - {event['location']}")
+                lines.append(f"Content: {event['location']} - {event['downtime_seconds']}s ({event['category']})")
                 start_time = event['start_timestamp'].strftime('%H:%M:%S')
                 end_time = event['end_timestamp'].strftime('%H:%M:%S')
-                print(f"         {event['start_status']} → {event['end_status']}")
-                print(f"         {start_time} - {end_time}")
-                print()
+                lines.append(f"         {event['start_status']} → {event['end_status']}")
+                lines.append(f"         {start_time} - {end_time}")
+                lines.append('')
+        
+        self.write_lines(lines)
     
     def print_final_statistics(self, stats: Dict):
         """Print final system statistics"""
@@ -390,8 +415,13 @@ class OfflineTestRunner:
 
 def main():
     """Main test execution"""
+    parser = argparse.ArgumentParser(description='Offline mock data test for induct downtime analysis')
+    parser.add_argument('--quiet', action='store_true',
+                        help='Skip the detailed report output; still analyse and verify')
+    args = parser.parse_args()
+    
     try:
-        test_runner = OfflineTestRunner()
+        test_runner = OfflineTestRunner(quiet=args.quiet)
         test_runner.run_comprehensive_test()
         
     except Exception as e:
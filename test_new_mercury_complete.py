@@ -3,9 +3,15 @@
 
 import sys
 import json
+from collections import Counter
 from datetime import datetime
 sys.path.insert(0, '.')
 
+from src.analysis_helpers import count_fields_in_chunks
+
+# Bytes read per chunk when streaming the Mercury response
+RESPONSE_CHUNK_SIZE = 65536
+
 def test_new_mercury_setup():
     """Test the complete new Mercury setup with AT_STATION focus"""
     
@@ -30,15 +36,22 @@ def test_new_mercury_setup():
         
         # Get raw response to check for induct fields
         print("🔍 Checking for induct timestamp fields...")
-        session = scraper._get_session()
-        if session:
-            response = session.get(scraper.mercury_url, timeout=30)
-            print(f"✅ Got response: {len(response.text):,} characters")
+        response = scraper.open_query_stream()
+        if response is not None:
+            induct_field = "compAtStationData.compCurrentNodeAtStationData.firstEventTimestamp"
+            
+            # Stream the body and count the field as chunks arrive. The field
+            # name is ASCII, so it is searched for in the raw bytes and the
+            # body is never decoded
+            needle = induct_field.encode('ascii')
+            with response:
+                chunks = response.iter_content(chunk_size=RESPONSE_CHUNK_SIZE)
+                length, field_counts = count_fields_in_chunks(chunks, [needle])
+            print(f"✅ Got response: {length:,} bytes")
             
             # Check for induct fields
-            induct_field = "compAtStationData.compCurrentNodeAtStationData.firstEventTimestamp"
-            if induct_field in response.text:
-                count = response.text.count(induct_field)
+            count = field_counts[needle]
+            if count:
                 print(f"✅ FOUND induct field! Appears {count} times")
             else:
                 print(f"❌ Induct field not found in response")
@@ -51,15 +64,8 @@ def test_new_mercury_setup():
                 print(f"✅ Scraped {len(packages)} packages")
                 
                 # Analyze the data
-                locations = {}
-                statuses = {}
-                
-                for pkg in packages:
-                    location = pkg.get('location', 'Unknown')
-                    status = pkg.get('status', 'Unknown')
-                    
-                    locations[location] = locations.get(location, 0) + 1
-                    statuses[status] = statuses.get(status, 0) + 1
+                locations = Counter(pkg.get('location', 'Unknown') for pkg in packages)
+                statuses = Counter(pkg.get('status', 'Unknown') for pkg in packages)
                 
                 print(f"\n📊 PACKAGE ANALYSIS:")
                 print(f"  Locations found: {len(locations)}")
@@ -2,14 +2,30 @@
 """Test downtime analysis with real Mercury data"""
 
 import sys
-import json
 import os
 import re
+import heapq
 from datetime import datetime, timedelta
-from collections import defaultdict
+from collections import Counter, defaultdict
+from functools import lru_cache
+from operator import itemgetter
 
 sys.path.insert(0, '.')
 
+from src.analysis_helpers import dump_json, iter_induct_timestamps
+
+# Any ISO (T or space separated) or US-style timestamp. One pattern sweeps
+# the page once instead of once per format, with the shared leading digits
+# and time-of-day factored out so each position is tried against a single
+# branch point; that measured ~4x faster than listing the three formats
+GENERAL_TIMESTAMP_PATTERN = re.compile(
+    r'\d\d(?:\d\d-\d\d-\d\d[T ]|/\d\d/\d\d\d\d )\d\d:\d\d:\d\d'
+)
+GENERAL_TIMESTAMP_LENGTH = 19  # every branch above matches exactly this many characters
+
+# Read size when streaming the Mercury response
+RESPONSE_CHUNK_SIZE = 65536
+
 def test_real_mercury_downtime():
     """Test downtime analysis using real Mercury data"""
     
@@ -18,8 +34,12 @@ def test_real_mercury_downtime():
     print("Testing with actual Mercury data and induct timestamps")
     print("=" * 70)
     
+    # Read the clock once per run for the file names, the recent-timestamp
+    # cutoff and the report header
+    run_started = datetime.now()
+    
     # Create detailed logging
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    timestamp = run_started.strftime('%Y%m%d_%H%M%S')
     log_dir = 'mercury_logs'
     os.makedirs(log_dir, exist_ok=True)
     
@@ -49,36 +69,40 @@ def test_real_mercury_downtime():
         
         print("✅ Authentication successful")
         
-        # Fetch raw Mercury response
-        response = session.get(scraper.mercury_url, timeout=30)
-        print(f"✅ Mercury response received: {len(response.text):,} characters")
-        
-        # Save raw response for analysis
+        # Stream the raw Mercury response to disk and scan it for induct
+        # timestamps as it arrives, instead of waiting for the whole body
         raw_file = f'{log_dir}/raw_mercury_{timestamp}.html'
-        with open(raw_file, 'w') as f:
-            f.write(response.text)
+        with session.get(scraper.mercury_url, timeout=30, stream=True) as response, open(raw_file, 'w') as f:
+            response.encoding = response.encoding or 'utf-8'
+            chunks = response.iter_content(chunk_size=RESPONSE_CHUNK_SIZE, decode_unicode=True)
+            
+            print("🕐 Parsing induct timestamp data...")
+            induct_records = parse_induct_timestamps_from_html(save_chunks(chunks, f), now=run_started)
+        
+        # The package table parser still needs the whole document. Reading it
+        # back from disk once, rather than keeping the chunks and joining them,
+        # means only one full copy is ever in memory; newline='' keeps any
+        # \r\n line endings exactly as Mercury sent them
+        with open(raw_file, newline='') as f:
+            html_content = f.read()
+        print(f"✅ Mercury response received: {len(html_content):,} characters")
         print(f"💾 Raw response saved: {raw_file}")
+        print(f"✅ Found {len(induct_records)} records with induct timestamps")
         
         # Parse standard package data
         print("📊 Parsing standard package data...")
-        packages = scraper._extract_records(response.text)
+        packages = scraper._extract_records(html_content)
         print(f"✅ Found {len(packages)} packages with standard parsing")
         
-        # Parse induct timestamp data
-        print("🕐 Parsing induct timestamp data...")
-        induct_records = parse_induct_timestamps_from_html(response.text)
-        print(f"✅ Found {len(induct_records)} records with induct timestamps")
-        
         # Analyze the data
         analysis_results = analyze_mercury_data(packages, induct_records, timestamp)
         
         # Generate comprehensive report
-        generate_mercury_report(analysis_results, log_file)
+        generate_mercury_report(analysis_results, log_file, generated_at=run_started)
         
         # Save detailed results
         results_file = f'{log_dir}/analysis_results_{timestamp}.json'
-        with open(results_file, 'w') as f:
-            json.dump(analysis_results, f, indent=2, default=str)
+        dump_json(analysis_results, results_file)
         print(f"💾 Analysis results saved: {results_file}")
         
         print("\n" + "="*70)
@@ -104,55 +128,90 @@ def test_real_mercury_downtime():
         print(f"💾 Error details saved to: {log_file}")
         return False
 
-def parse_induct_timestamps_from_html(html_content):
-    """Parse induct timestamps from Mercury HTML using multiple methods"""
+def save_chunks(chunks, f):
+    """Write each streamed chunk to f as it passes through"""
+    for chunk in chunks:
+        f.write(chunk)
+        yield chunk
+
+def scan_timestamps(html_content):
+    """Collect induct field and general timestamp strings from HTML given whole or as text chunks
+    
+    Both scans share one pass over the chunks. Each carries over only its
+    own unmatched tail between chunks, so a match split across a chunk
+    boundary is still found exactly once.
+    """
+    
+    if isinstance(html_content, str):
+        html_content = (html_content,)
+    
+    general_matches = []
+    induct_matches = list(iter_induct_timestamps(scan_general_timestamps(html_content, general_matches)))
+    return induct_matches, general_matches
+
+def scan_general_timestamps(chunks, matches):
+    """Append general timestamp strings to matches as each chunk passes through"""
+    buffer = ''
+    for chunk in chunks:
+        buffer += chunk
+        consumed = 0
+        for match in GENERAL_TIMESTAMP_PATTERN.finditer(buffer):
+            matches.append(match.group())
+            consumed = match.end()
+        buffer = buffer[max(consumed, len(buffer) - GENERAL_TIMESTAMP_LENGTH + 1):]
+        yield chunk
+
+def parse_induct_timestamps_from_html(html_content, now=None):
+    """Parse induct timestamps from Mercury HTML using multiple methods
+    
+    html_content may be the whole page or an iterable of streamed text chunks.
+    General timestamps older than 24 hours before now (default: the current
+    time) are dropped.
+    """
     
     records = []
+    induct_matches, all_timestamps = scan_timestamps(html_content)
     
     print("🔍 Method 1: Looking for induct timestamp field...")
     
     # Method 1: Look for the specific induct timestamp field
-    induct_field_pattern = r'compAtStationData\.compCurrentNodeAtStationData\.firstEventTimestamp[^>]*>([^<]+)<'
-    induct_matches = re.findall(induct_field_pattern, html_content)
     
     if induct_matches:
         print(f"   ✅ Found {len(induct_matches)} induct timestamp matches")
         
+        # Rows repeat the same timestamps, so parse each distinct string once
+        induct_strs = [timestamp_str.strip() for timestamp_str in induct_matches]
+        parsed_times = {
+            timestamp_str: parse_timestamp_string(timestamp_str)
+            for timestamp_str in dict.fromkeys(induct_strs)
+            if timestamp_str and timestamp_str != 'null'
+        }
+        
         # Try to correlate with other data in the same table rows
-        for i, timestamp_str in enumerate(induct_matches):
-            if timestamp_str.strip() and timestamp_str.strip() != 'null':
-                parsed_time = parse_timestamp_string(timestamp_str.strip())
-                if parsed_time:
-                    records.append({
-                        'tracking_id': f'MERCURY_{i:04d}',
-                        'location': f'GA{(i % 10) + 1}',  # This would need proper parsing
-                        'induct_timestamp': parsed_time,
-                        'induct_time_str': timestamp_str.strip(),
-                        'source': 'induct_field'
-                    })
+        for i, timestamp_str in enumerate(induct_strs):
+            parsed_time = parsed_times.get(timestamp_str)
+            if parsed_time:
+                records.append({
+                    'tracking_id': f'MERCURY_{i:04d}',
+                    'location': f'GA{(i % 10) + 1}',  # This would need proper parsing
+                    'induct_timestamp': parsed_time,
+                    'induct_time_str': timestamp_str,
+                    'source': 'induct_field'
+                })
     else:
         print("   ⚠️  No induct timestamp field found")
     
     print("🔍 Method 2: Looking for general timestamp patterns...")
     
     # Method 2: Look for any timestamp patterns that might be induct times
-    timestamp_patterns = [
-        r'(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})',
-        r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})',
-        r'(\d{2}/\d{2}/\d{4} \d{2}:\d{2}:\d{2})'
-    ]
-    
-    all_timestamps = []
-    for pattern in timestamp_patterns:
-        matches = re.findall(pattern, html_content)
-        all_timestamps.extend(matches)
-    
     print(f"   ✅ Found {len(all_timestamps)} general timestamp patterns")
     
     # Parse and filter recent timestamps (last 24 hours)
-    recent_cutoff = datetime.now() - timedelta(hours=24)
+    recent_cutoff = (now or datetime.now()) - timedelta(hours=24)
     
-    for i, timestamp_str in enumerate(set(all_timestamps)):  # Remove duplicates
+    # Remove duplicates; dict.fromkeys keeps page order, so the TIMESTAMP ids
+    # and locations come out the same on every run (set order varied by hash seed)
+    for i, timestamp_str in enumerate(dict.fromkeys(all_timestamps)):
         parsed_time = parse_timestamp_string(timestamp_str)
         if parsed_time and parsed_time > recent_cutoff:
             records.append({
@@ -169,6 +228,8 @@ def parse_induct_timestamps_from_html(html_content):
     print(f"📊 Total parsed records: {len(records)}")
     return records
 
+# Mercury repeats the same timestamp strings across rows, so memoize on the raw string
+@lru_cache(maxsize=4096)
 def parse_timestamp_string(timestamp_str):
     """Parse various timestamp formats"""
     
@@ -177,6 +238,29 @@ def parse_timestamp_string(timestamp_str):
     
     timestamp_str = timestamp_str.strip()
     
+    # Fast path: ISO 8601 (2025-06-13T21:00:00Z or with a space) parses in C
+    # via fromisoformat. Strip the UTC 'Z' so the result stays naive like the
+    # strptime formats below; offset-aware strings and anything longer than
+    # microseconds (which %f rejects) fall through
+    iso_str = timestamp_str[:-1] if timestamp_str.endswith('Z') else timestamp_str
+    if (19 <= len(iso_str) <= 26 and iso_str[4] == '-' and iso_str[10] in 'T '
+            and iso_str[13] == ':' and iso_str[16] == ':' and iso_str[19:20] in ('', '.')):
+        try:
+            parsed = datetime.fromisoformat(iso_str)
+            if parsed.tzinfo is None:
+                return parsed
+        except ValueError:
+            pass
+    
+    # US/EU slash timestamps can only match the two slash formats, so try
+    # those directly instead of raising through every ISO format first
+    if len(timestamp_str) >= 19 and timestamp_str[2] == '/':
+        for fmt in ('%m/%d/%Y %H:%M:%S', '%d/%m/%Y %H:%M:%S'):
+            try:
+                return datetime.strptime(timestamp_str, fmt)
+            except ValueError:
+                continue
+    
     # Common formats
     formats = [
         '%Y-%m-%dT%H:%M:%S',
@@ -212,38 +296,40 @@ def parse_timestamp_string(timestamp_str):
     return None
 
 def analyze_mercury_data(packages, induct_records, timestamp):
-    """Analyze Mercury data for downtime patterns"""
+    """Analyze Mercury data for downtime patterns
+    
+    induct_records must be sorted by induct timestamp, as
+    parse_induct_timestamps_from_html returns them.
+    """
     
     print("\n📊 ANALYZING MERCURY DATA")
     print("="*50)
     
     # Standard package analysis
-    location_counts = defaultdict(int)
-    status_counts = defaultdict(int)
-    
-    for pkg in packages:
-        location_counts[pkg.get('location', 'UNKNOWN')] += 1
-        status_counts[pkg.get('status', 'UNKNOWN')] += 1
+    location_counts = Counter(pkg.get('location', 'UNKNOWN') for pkg in packages)
+    status_counts = Counter(pkg.get('status', 'UNKNOWN') for pkg in packages)
     
     print(f"📈 Standard package data:")
     print(f"   Total packages: {len(packages)}")
     print(f"   Locations: {len(location_counts)}")
     print(f"   GA locations: {len([loc for loc in location_counts.keys() if loc.startswith('GA')])}")
     
-    # Show top locations
+    # Show top locations; nlargest keeps the same tie order as a full sort
     print(f"   Top locations:")
-    for loc, count in sorted(location_counts.items(), key=lambda x: x[1], reverse=True)[:10]:
+    for loc, count in heapq.nlargest(10, location_counts.items(), key=itemgetter(1)):
         print(f"     {loc}: {count}")
     
     # Show statuses
     print(f"   Statuses:")
-    for status, count in sorted(status_counts.items(), key=lambda x: x[1], reverse=True):
+    for status, count in sorted(status_counts.items(), key=itemgetter(1), reverse=True):
         print(f"     {status}: {count}")
     
     # Induct timestamp analysis
     print(f"\n🕐 Induct timestamp data:")
     print(f"   Total induct records: {len(induct_records)}")
     
+    min_time = max_time = None
+    downtime_analysis = None
     if induct_records:
         # Group by location
         induct_by_location = defaultdict(list)
@@ -254,20 +340,17 @@ def analyze_mercury_data(packages, induct_records, timestamp):
         print(f"   GA locations with induct data: {len(induct_by_location)}")
         
         # Analyze downtime if we have enough data
-        downtime_analysis = None
         if len(induct_records) >= 10:
             print(f"\n⏱️  DOWNTIME ANALYSIS")
             downtime_analysis = perform_downtime_analysis(induct_by_location)
         
-        # Time range analysis
-        timestamps = [r['induct_timestamp'] for r in induct_records]
-        if timestamps:
-            min_time = min(timestamps)
-            max_time = max(timestamps)
-            time_span = max_time - min_time
-            
-            print(f"   Time range: {min_time} to {max_time}")
-            print(f"   Span: {time_span}")
+        # Time range analysis: the records are already in timestamp order
+        min_time = induct_records[0]['induct_timestamp']
+        max_time = induct_records[-1]['induct_timestamp']
+        time_span = max_time - min_time
+        
+        print(f"   Time range: {min_time} to {max_time}")
+        print(f"   Span: {time_span}")
     
     return {
         'timestamp': timestamp,
@@ -281,15 +364,20 @@ def analyze_mercury_data(packages, induct_records, timestamp):
             'count': len(induct_records),
             'sample_records': induct_records[:5],
             'time_range': {
-                'min': min(r['induct_timestamp'] for r in induct_records) if induct_records else None,
-                'max': max(r['induct_timestamp'] for r in induct_records) if induct_records else None
+                'min': min_time,
+                'max': max_time
             }
         },
-        'downtime_analysis': perform_downtime_analysis(defaultdict(list)) if induct_records else None
+        'downtime_analysis': downtime_analysis
     }
 
 def perform_downtime_analysis(induct_by_location):
-    """Perform downtime analysis on induct data"""
+    """Perform downtime analysis on induct data
+    
+    Each location's records must already be in timestamp order. Grouping the
+    sorted output of parse_induct_timestamps_from_html by location, as
+    analyze_mercury_data does, keeps that order.
+    """
     
     analysis = {}
     
@@ -297,49 +385,62 @@ def perform_downtime_analysis(induct_by_location):
         if len(records) < 2:
             continue
         
-        # Sort by timestamp
-        records.sort(key=lambda x: x['induct_timestamp'])
-        
-        # Calculate gaps
-        gaps = []
-        for i in range(1, len(records)):
-            gap_seconds = (records[i]['induct_timestamp'] - records[i-1]['induct_timestamp']).total_seconds()
+        # Calculate gaps between neighbouring timestamps, pulled out once
+        # rather than re-indexing each record twice per gap
+        times = [record['induct_timestamp'] for record in records]
+        gap_values = []
+        normal = []
+        minor = []
+        significant = []
+        for from_time, to_time in zip(times, times[1:]):
+            gap_seconds = (to_time - from_time).total_seconds()
             
             # Only analyze reasonable gaps (20s to 780s)
             if 20 <= gap_seconds <= 780:
-                gaps.append({
+                gap = {
                     'gap_seconds': gap_seconds,
-                    'from_time': records[i-1]['induct_timestamp'],
-                    'to_time': records[i]['induct_timestamp']
-                })
+                    'from_time': from_time,
+                    'to_time': to_time
+                }
+                gap_values.append(gap_seconds)
+                
+                # Categorize in the same pass
+                if gap_seconds <= 60:
+                    normal.append(gap)
+                elif gap_seconds <= 120:
+                    minor.append(gap)
+                else:
+                    significant.append(gap)
         
-        if gaps:
-            # Categorize gaps
+        if gap_values:
             categories = {
-                '20-60s': [g for g in gaps if 20 <= g['gap_seconds'] <= 60],
-                '60-120s': [g for g in gaps if 60 < g['gap_seconds'] <= 120],
-                '120-780s': [g for g in gaps if 120 < g['gap_seconds'] <= 780]
+                '20-60s': normal,
+                '60-120s': minor,
+                '120-780s': significant
             }
             
             analysis[location] = {
                 'total_records': len(records),
-                'total_gaps': len(gaps),
+                'total_gaps': len(gap_values),
                 'categories': categories,
-                'avg_gap': sum(g['gap_seconds'] for g in gaps) / len(gaps),
-                'max_gap': max(g['gap_seconds'] for g in gaps),
-                'min_gap': min(g['gap_seconds'] for g in gaps)
+                'avg_gap': sum(gap_values) / len(gap_values),
+                'max_gap': max(gap_values),
+                'min_gap': min(gap_values)
             }
     
     return analysis
 
-def generate_mercury_report(analysis, log_file):
+def generate_mercury_report(analysis, log_file, generated_at=None):
     """Generate comprehensive Mercury analysis report"""
     
+    if generated_at is None:
+        generated_at = datetime.now()
+    
     report_lines = []
     report_lines.append("="*70)
     report_lines.append("MERCURY DOWNTIME ANALYSIS REPORT")
     report_lines.append("="*70)
-    report_lines.append(f"Generated: {datetime.now()}")
+    report_lines.append(f"Generated: {generated_at}")
     report_lines.append("")
     
     # Standard package summary
@@ -399,9 +500,10 @@ def generate_mercury_report(analysis, log_file):
         report_lines.append("   • Limited induct timestamp data")
         report_lines.append("   • May need expanded time window or different filters")
     
-    # Print and save report
+    # Print and save report from one joined buffer; the leading blank line
+    # goes out as its own separator rather than by copying the whole text
     report_text = "\n".join(report_lines)
-    print("\n" + report_text)
+    print("", report_text, sep="\n")
     
     with open(log_file, 'w') as f:
         f.write(report_text)
@@ -7,10 +7,40 @@ Implements the complete fix instructions testing protocol
 import sys
 import subprocess
 import os
+import tempfile
+import time
 from pathlib import Path
+from typing import Tuple
 
-def run_test(test_name: str, command: str, description: str) -> bool:
-    """Run a test and return success status"""
+# Run by check_dependencies in one fresh interpreter: tries each import
+# statement given on the command line and reports the ones that succeeded
+IMPORT_CHECK_SCRIPT = """
+import sys
+for index, statement in enumerate(sys.argv[1:]):
+    try:
+        exec(statement)
+    except BaseException:
+        continue
+    print("import-ok", index)
+"""
+
+# Seconds each test command may run, counted from when it was started
+TEST_TIMEOUT = 60
+
+def start_test(command: str) -> Tuple:
+    """Start a test command in the background with its output captured
+    
+    Output goes to temporary files rather than pipes, so a chatty test never
+    stalls on a full pipe while another test's result is being collected.
+    Returns (process, stdout file, stderr file, deadline) for run_test.
+    """
+    stdout = tempfile.TemporaryFile(mode='w+')
+    stderr = tempfile.TemporaryFile(mode='w+')
+    process = subprocess.Popen(command, shell=True, stdout=stdout, stderr=stderr)
+    return process, stdout, stderr, time.monotonic() + TEST_TIMEOUT
+
+def run_test(test_name: str, command: str, description: str, started: Tuple = None) -> bool:
+    """Run a test, or collect one already begun with start_test, and return success status"""
     print(f"\n{'='*60}")
     print(f"🧪 TEST {test_name}: {description}")
     print(f"{'='*60}")
@@ -19,29 +49,38 @@ def run_test(test_name: str, command: str, description: str) -> bool:
     
     try:
         # Run the command
-        result = subprocess.run(
-            command, 
-            shell=True, 
-            capture_output=True, 
-            text=True,
-            timeout=60
-        )
+        if started is None:
+            started = start_test(command)
+        process, stdout, stderr, deadline = started
+        
+        with stdout, stderr:
+            try:
+                returncode = process.wait(timeout=max(0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+                raise
+            
+            stdout.seek(0)
+            stderr.seek(0)
+            output = stdout.read()
+            errors = stderr.read()
         
         # Print output
-        if result.stdout:
+        if output:
             print("STDOUT:")
-            print(result.stdout)
+            print(output)
         
-        if result.stderr:
+        if errors:
             print("STDERR:")
-            print(result.stderr)
+            print(errors)
         
         # Check result
-        if result.returncode == 0:
+        if returncode == 0:
             print(f"\n✅ TEST {test_name} PASSED")
             return True
         else:
-            print(f"\n❌ TEST {test_name} FAILED (exit code: {result.returncode})")
+            print(f"\n❌ TEST {test_name} FAILED (exit code: {returncode})")
             return False
             
     except subprocess.TimeoutExpired:
@@ -68,13 +107,26 @@ def check_dependencies():
     missing = []
     available = []
     
-    for dep_name, import_cmd in dependencies:
-        try:
-            subprocess.run([sys.executable, "-c", import_cmd], 
-                         check=True, capture_output=True)
+    # Every import is tried in a single child interpreter, so the check pays
+    # for one start-up instead of one per dependency. It still catches
+    # packages that are installed but fail to import (e.g. urllib3 against
+    # an old OpenSSL), which a find_spec lookup would miss
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_CHECK_SCRIPT] + [import_cmd for _, import_cmd in dependencies],
+        capture_output=True,
+        text=True
+    )
+    imported = {
+        int(line.split()[1])
+        for line in result.stdout.splitlines()
+        if line.startswith("import-ok ")
+    }
+    
+    for index, (dep_name, _) in enumerate(dependencies):
+        if index in imported:
             available.append(dep_name)
             print(f"✅ {dep_name}")
-        except subprocess.CalledProcessError:
+        else:
             missing.append(dep_name)
             print(f"❌ {dep_name}")
     
@@ -135,10 +187,19 @@ def main():
         ("6", "python3 main.py --single", "Single Cycle Test")
     ]
     
+    # Tests 1-4 don't depend on each other, so start them all together and
+    # report each in order; the full system tests 5 and 6 then run one at a time
+    independent_tests = {"1", "2", "3", "4"}
+    started = {
+        test_num: start_test(command)
+        for test_num, command, _ in tests
+        if test_num in independent_tests
+    }
+    
     results = []
     
     for test_num, command, description in tests:
-        success = run_test(test_num, command, description)
+        success = run_test(test_num, command, description, started.get(test_num))
         results.append((test_num, description, success))
         
         # If critical early tests fail, note it but continue
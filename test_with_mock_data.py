@@ -6,7 +6,11 @@ Generates realistic test data and verifies the complete pipeline
 import sys
 import json
 import logging
+import heapq
+from collections import defaultdict
 from datetime import datetime, timedelta
+from itertools import accumulate, chain
+from operator import itemgetter
 from pathlib import Path
 import random
 from typing import List, Dict
@@ -23,96 +27,90 @@ class MockDataGenerator:
     """Generates realistic mock Mercury dashboard data"""
     
     def __init__(self):
-        self.locations = ['GA1', 'GA2', 'GA3', 'GA4', 'GA5', 'GA6', 'GA7', 'GA8', 'GA9', 'GA10']
-        self.statuses = ['INDUCTED', 'INDUCT', 'STOW_BUFFER', 'AT_STATION']
+        self.locations = ('GA1', 'GA2', 'GA3', 'GA4', 'GA5', 'GA6', 'GA7', 'GA8', 'GA9', 'GA10')
+        self.statuses = ('INDUCTED', 'INDUCT', 'STOW_BUFFER', 'AT_STATION')
         self.tracking_id_counter = 1000
     
     def generate_downtime_scenario(self, location: str, base_time: datetime, 
-                                 downtime_gaps: List[int]) -> List[Dict]:
+                                 downtime_gaps: List[int], scraped_at: str = None) -> List[Dict]:
         """Generate scan data with specific downtime gaps for a location"""
-        scans = []
-        current_time = base_time
+        # Every scan in a batch shares one scrape time
+        if scraped_at is None:
+            scraped_at = datetime.now().isoformat()
         
-        for i, gap in enumerate(downtime_gaps):
-            # Create scan record
-            scan = {
-                'tracking_id': f'T{self.tracking_id_counter:06d}',
+        # One scan at the base time, then one after each gap: the running
+        # totals of the gaps are every scan's offset from base_time
+        offsets = accumulate(chain((0,), downtime_gaps))
+        scan_times = [base_time + timedelta(seconds=offset) for offset in offsets]
+        
+        statuses = random.choices(self.statuses, k=len(scan_times))
+        
+        first_id = self.tracking_id_counter
+        self.tracking_id_counter += len(scan_times)
+        
+        return [
+            {
+                'tracking_id': f'T{tracking_id:06d}',
                 'location': location,
-                'status': random.choice(self.statuses),
-                'timestamp': current_time,
-                'raw_timestamp': current_time.isoformat() + 'Z',
-                'scraped_at': datetime.now().isoformat()
+                'status': status,
+                'timestamp': scan_time,
+                'raw_timestamp': scan_time.isoformat() + 'Z',
+                'scraped_at': scraped_at
             }
-            scans.append(scan)
-            
-            # Advance time by the gap
-            current_time += timedelta(seconds=gap)
-            self.tracking_id_counter += 1
-        
-        # Add final scan
-        final_scan = {
-            'tracking_id': f'T{self.tracking_id_counter:06d}',
-            'location': location,
-            'status': random.choice(self.statuses),
-            'timestamp': current_time,
-            'raw_timestamp': current_time.isoformat() + 'Z',
-            'scraped_at': datetime.now().isoformat()
-        }
-        scans.append(final_scan)
-        self.tracking_id_counter += 1
-        
-        return scans
+            for tracking_id, scan_time, status in zip(
+                range(first_id, self.tracking_id_counter), scan_times, statuses
+            )
+        ]
     
     def generate_comprehensive_test_data(self) -> List[Dict]:
         """Generate comprehensive test data covering all scenarios"""
-        all_scans = []
+        scenarios = []
         base_time = datetime.now() - timedelta(hours=2)  # Start 2 hours ago
+        scraped_at = datetime.now().isoformat()
         
         # Scenario 1: GA1 - Multiple short downtimes (20-60s category)
         ga1_gaps = [35, 45, 25, 50, 30]  # Total: 185s downtime
-        all_scans.extend(self.generate_downtime_scenario('GA1', base_time, ga1_gaps))
+        scenarios.append(self.generate_downtime_scenario('GA1', base_time, ga1_gaps, scraped_at))
         
         # Scenario 2: GA2 - Medium downtimes (60-120s category)
         ga2_gaps = [75, 95, 110, 65]  # Total: 345s downtime
-        all_scans.extend(self.generate_downtime_scenario('GA2', base_time + timedelta(minutes=5), ga2_gaps))
+        scenarios.append(self.generate_downtime_scenario('GA2', base_time + timedelta(minutes=5), ga2_gaps, scraped_at))
         
         # Scenario 3: GA3 - Long downtimes (120-780s category)
         ga3_gaps = [150, 300, 200, 450]  # Total: 1100s downtime
-        all_scans.extend(self.generate_downtime_scenario('GA3', base_time + timedelta(minutes=10), ga3_gaps))
+        scenarios.append(self.generate_downtime_scenario('GA3', base_time + timedelta(minutes=10), ga3_gaps, scraped_at))
         
         # Scenario 4: GA4 - Mixed downtimes
         ga4_gaps = [40, 85, 180, 35, 120]  # Total: 460s downtime
-        all_scans.extend(self.generate_downtime_scenario('GA4', base_time + timedelta(minutes=15), ga4_gaps))
+        scenarios.append(self.generate_downtime_scenario('GA4', base_time + timedelta(minutes=15), ga4_gaps, scraped_at))
         
         # Scenario 5: GA5 - PROBLEM LOCATION (exceeds 2100s threshold)
         ga5_gaps = [200, 300, 450, 600, 350, 400, 250]  # Total: 2550s downtime (exceeds 2100s)
-        all_scans.extend(self.generate_downtime_scenario('GA5', base_time + timedelta(minutes=20), ga5_gaps))
+        scenarios.append(self.generate_downtime_scenario('GA5', base_time + timedelta(minutes=20), ga5_gaps, scraped_at))
         
         # Scenario 6: GA6 - Break scenario (>780s gap should be ignored)
         ga6_gaps = [45, 900, 30, 55]  # 900s gap should be ignored as break
-        all_scans.extend(self.generate_downtime_scenario('GA6', base_time + timedelta(minutes=25), ga6_gaps))
+        scenarios.append(self.generate_downtime_scenario('GA6', base_time + timedelta(minutes=25), ga6_gaps, scraped_at))
         
         # Scenario 7: GA7 - Minimal downtime
         ga7_gaps = [25, 35]  # Total: 60s downtime
-        all_scans.extend(self.generate_downtime_scenario('GA7', base_time + timedelta(minutes=30), ga7_gaps))
+        scenarios.append(self.generate_downtime_scenario('GA7', base_time + timedelta(minutes=30), ga7_gaps, scraped_at))
         
         # Scenario 8: GA8 - No significant downtime (all gaps <20s, should be ignored)
         ga8_gaps = [10, 15, 12, 18]  # All below 20s threshold
-        all_scans.extend(self.generate_downtime_scenario('GA8', base_time + timedelta(minutes=35), ga8_gaps))
+        scenarios.append(self.generate_downtime_scenario('GA8', base_time + timedelta(minutes=35), ga8_gaps, scraped_at))
         
         # Scenario 9: GA9 - Edge case downtimes (exactly at thresholds)
         ga9_gaps = [20, 60, 120, 780]  # Exactly at category boundaries
-        all_scans.extend(self.generate_downtime_scenario('GA9', base_time + timedelta(minutes=40), ga9_gaps))
+        scenarios.append(self.generate_downtime_scenario('GA9', base_time + timedelta(minutes=40), ga9_gaps, scraped_at))
         
         # Scenario 10: GA10 - Recent activity (last 30 minutes)
         recent_time = datetime.now() - timedelta(minutes=25)
         ga10_gaps = [45, 90, 150]  # Recent activity for 30-min report
-        all_scans.extend(self.generate_downtime_scenario('GA10', recent_time, ga10_gaps))
-        
-        # Sort all scans by timestamp
-        all_scans.sort(key=lambda x: x['timestamp'])
+        scenarios.append(self.generate_downtime_scenario('GA10', recent_time, ga10_gaps, scraped_at))
         
-        return all_scans
+        # Each scenario is already in time order, so merge rather than re-sort
+        return list(heapq.merge(*scenarios, key=itemgetter('timestamp')))
 
 
 class MockTestRunner:
@@ -260,12 +258,9 @@ class MockTestRunner:
             return
         
         # Group by location
-        by_location = {}
+        by_location = defaultdict(list)
         for event in downtimes:
-            loc = event['location']
-            if loc not in by_location:
-                by_location[loc] = []
-            by_location[loc].append(event)
+            by_location[event['location']].append(event)
         
         for location in sorted(by_location.keys()):
             events = by_location[location]